@@ -1,28 +1,55 @@
+import fnmatch
 import glob
 import os
 import re
 import sys
 import argparse
+import functools
 import subprocess # Added for git command
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Iterator, Optional
+import pathspec
 from rich.console import Console
 from rich.table import Table
 
 
+_pattern_cache: dict[str, re.Pattern] = {} # Glob path segment -> compiled regex, see glob_to_regex
+_GLOB_CHARS = frozenset("*?[") # A pattern is a glob if it contains any of these
+_MAX_TABLE_ROWS = 500 # Above this, results are streamed as plain tab-separated lines
+
+
 def get_git_repo_root(path_within_repo):
     """Tries to find the root of the git repository containing the given path."""
-    try:
-        # Ensure the path is a directory for the -C argument if git version requires it
-        # However, git rev-parse --show-toplevel usually works fine with a file path too
-        # or from any subdirectory.
-        # We use os.path.dirname to be safe and start from the directory of the path.
-        start_dir = os.path.dirname(os.path.abspath(path_within_repo))
-        if not os.path.isdir(start_dir):
-             # If path_within_repo is a dir itself and exists
-            if os.path.isdir(os.path.abspath(path_within_repo)):
-                start_dir = os.path.abspath(path_within_repo)
-            else: # Fallback if dirname doesn't make sense (e.g. top level file)
-                start_dir = os.getcwd()
+    # Ensure the path is a directory for the -C argument if git version requires it
+    # However, git rev-parse --show-toplevel usually works fine with a file path too
+    # or from any subdirectory.
+    # We use os.path.dirname to be safe and start from the directory of the path.
+    start_dir = os.path.dirname(os.path.abspath(path_within_repo))
+    if not os.path.isdir(start_dir):
+         # If path_within_repo is a dir itself and exists
+        if os.path.isdir(os.path.abspath(path_within_repo)):
+            start_dir = os.path.abspath(path_within_repo)
+        else: # Fallback if dirname doesn't make sense (e.g. top level file)
+            start_dir = os.getcwd()
+    return find_git_repo_root(start_dir)
+
 
+@functools.lru_cache(maxsize=64)
+def find_git_repo_root(start_dir):
+    """Returns the git repository root for a directory, cached per directory."""
+    # Look for .git in the directory and its parents first, which avoids spawning git
+    # in the common case. .git may also be a file (worktrees, submodules).
+    current_dir = start_dir
+    while True:
+        if os.path.exists(os.path.join(current_dir, ".git")):
+            return current_dir
+        parent_dir = os.path.dirname(current_dir)
+        if parent_dir == current_dir:
+            break
+        current_dir = parent_dir
+
+    try:
         toplevel = subprocess.check_output(
             ['git', '-C', start_dir, 'rev-parse', '--show-toplevel'],
             stderr=subprocess.STDOUT, # Suppress error messages on stderr for controlled failure
@@ -34,61 +61,275 @@ def get_git_repo_root(path_within_repo):
         return None
 
 
-def parse_codeowners(codeowners_path, project_root):
-    nonexistent_entries_details = []
-    original_lines_with_eol = [] # To store all original lines
+def scan_directory(dirpath: str) -> list:
+    """Lists a directory as (name, path, is_dir, is_symlink) tuples, or nothing if it can't be read.
+
+    is_dir follows symlinks, like the os.path.exists checks this replaces.
+    """
+    try:
+        it = os.scandir(dirpath)
+    except OSError:
+        return []
+    entries = []
+    with it:
+        for entry in it:
+            try:
+                is_dir = entry.is_dir()
+            except OSError: # e.g. a symlink loop or a link into an unreadable directory
+                is_dir = False
+            entries.append((entry.name, entry.path, is_dir, entry.is_symlink()))
+    return entries
+
+
+def load_gitignore_spec(project_root):
+    """Parses the project's top-level .gitignore, or returns None if there is none."""
+    try:
+        # The file is optional, so undecodable bytes must not abort the run
+        with open(os.path.join(project_root, ".gitignore"), "r", encoding="utf-8", errors="replace") as file:
+            return pathspec.GitIgnoreSpec.from_lines(file)
+    except OSError:
+        return None
+
+
+@dataclass
+class UnwalkedDirectory:
+    """Tree node for a directory build_tree did not descend into, checked on disk instead."""
+    path: str
+
+
+def build_tree(project_root: str) -> dict:
+    """Walks the project once into nested dicts of name -> subtree, with None for files.
+
+    .git and directories ignored by the top-level .gitignore are not descended into.
+    Symlinked directories are followed; links resolving to the same real directory
+    share one subtree, which also stops symlink cycles. Links leading out of the
+    project are not followed, so a link to e.g. / can't make the walk cover the
+    whole filesystem.
+    """
+    gitignore_spec = load_gitignore_spec(project_root)
+    tree: dict = {}
+    real_project_root = os.path.realpath(project_root)
+    real_project_prefix = os.path.join(real_project_root, "")
+    nodes_by_link_target = {real_project_root: tree}
+    pending = [(project_root, "", tree)]
+    # Directory reads are syscall-bound and release the GIL, so scan each level concurrently
+    with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4)) as executor:
+        while pending:
+            next_pending = []
+            scanned = executor.map(scan_directory, [dirpath for dirpath, _, _ in pending])
+            for (_, rel_dir, node), entries in zip(pending, scanned):
+                for name, path, is_dir, is_symlink in entries:
+                    if not is_dir:
+                        node[name] = None
+                        continue
+                    if name == ".git": # Never descend into git's own metadata
+                        node[name] = UnwalkedDirectory(path)
+                        continue
+                    rel_path = rel_dir + name + "/"
+                    if gitignore_spec is not None and gitignore_spec.match_file(rel_path):
+                        # Still checked on disk, ignored directories may hold force-added files
+                        node[name] = UnwalkedDirectory(path)
+                        continue
+                    if is_symlink:
+                        target = os.path.realpath(path)
+                        if target != real_project_root and not target.startswith(real_project_prefix):
+                            node[name] = UnwalkedDirectory(path)
+                            continue
+                        if target in nodes_by_link_target:
+                            node[name] = nodes_by_link_target[target]
+                            continue
+                        node[name] = nodes_by_link_target[target] = {}
+                    else:
+                        node[name] = {}
+                    next_pending.append((path, rel_path, node[name]))
+            pending = next_pending
+    return tree
+
+
+def iter_subtrees(nodes: list) -> Iterator[object]:
+    """Yields the given nodes and every node below them, skipping hidden names like glob's "**".
+
+    Files (None) and UnwalkedDirectory nodes are yielded but not descended into.
+    """
+    pending = [node for node in nodes if isinstance(node, dict)]
+    seen = set() # Several "**" in one pattern reach the same directories more than once
+    while pending:
+        node = pending.pop()
+        if id(node) in seen:
+            continue
+        seen.add(id(node))
+        yield node
+        for name, child in node.items():
+            if name.startswith("."):
+                continue
+            if isinstance(child, dict):
+                pending.append(child)
+            else:
+                yield child
+
+
+def disk_contains(dirpath: str, segments: list, directories_only: bool) -> bool:
+    """Checks pattern segments below a directory on disk, for parts of the project the tree doesn't cover."""
+    relative_pattern = os.path.join(*segments)
+    if _GLOB_CHARS.isdisjoint(relative_pattern):
+        path = os.path.join(dirpath, relative_pattern)
+        return os.path.isdir(path) if directories_only else os.path.lexists(path)
+    glob_matches = glob.glob(os.path.join(glob.escape(dirpath), relative_pattern), recursive=True)
+    if directories_only:
+        return any(os.path.isdir(match) for match in glob_matches)
+    return bool(glob_matches)
+
+
+def tree_contains(tree: dict, relative_pattern: str, directories_only: bool = False) -> bool:
+    """Checks whether a relative POSIX path or glob pattern matches anything in the tree.
+
+    A "**" segment matches zero or more directories. With directories_only, as for
+    CODEOWNERS entries ending in "/", only directories count. Below an
+    UnwalkedDirectory the rest of the pattern is checked on disk.
+    """
+    segments = relative_pattern.split("/")
+    current_nodes: list = [tree]
+    for index, segment in enumerate(segments):
+        for node in current_nodes:
+            if isinstance(node, UnwalkedDirectory) and disk_contains(node.path, segments[index:], directories_only):
+                return True
+        if segment == "**":
+            current_nodes = list(iter_subtrees(current_nodes))
+            if not current_nodes: # Only files before "**", there is nothing to descend into
+                return False
+            continue
+        matched_nodes: list = []
+        is_glob_segment = not _GLOB_CHARS.isdisjoint(segment)
+        regex = glob_to_regex(segment) if is_glob_segment else None
+        for node in current_nodes:
+            if not isinstance(node, dict): # A file, or unwalked and already checked above
+                continue
+            if regex is not None:
+                matched_nodes.extend(child for name, child in node.items() if regex.match(name))
+            elif segment in node:
+                matched_nodes.append(node[segment])
+        if not matched_nodes:
+            return False
+        current_nodes = matched_nodes
+    if directories_only:
+        # Directory-ness comes from the scan, files are None
+        return any(node is not None for node in current_nodes)
+    return True
+
+
+def glob_to_regex(segment: str) -> re.Pattern:
+    """Compiles one glob path segment into a regex with glob.glob semantics, cached per segment.
+
+    As with glob.glob, the segment only matches names starting with "." if the
+    segment itself starts with ".".
+    """
+    regex = _pattern_cache.get(segment)
+    if regex is None:
+        hidden_guard = "" if segment.startswith(".") else r"(?!\.)"
+        regex = _pattern_cache[segment] = re.compile(hidden_guard + fnmatch.translate(segment))
+    return regex
+
+
+@dataclass
+class ParseResult:
+    """Outcome of parse_codeowners, without keeping the file's lines around."""
+    entries: list # (file_pattern, owner, line_num_1_indexed, original_line_for_display)
+    total_lines: int
+
+
+def parse_codeowners(codeowners_path: str, project_root: Optional[str]) -> ParseResult:
+    nonexistent_entries_details: list = []
     if not os.path.exists(codeowners_path):
         Console().print(f"[bold red]Error: {codeowners_path} does not exist.[/bold red]")
         sys.exit(1)
 
-    line_num_1_indexed = 0
-    with open(codeowners_path, "r", encoding="utf-8") as file:
-        for original_line_content_with_eol in file:
-            original_lines_with_eol.append(original_line_content_with_eol) # Store raw line
-            line_num_1_indexed += 1
-            line = original_line_content_with_eol.strip()
-            if not line or line.startswith("#"):
-                continue
+    current_project_root = os.path.normpath(project_root or os.getcwd())
+    # Joined by plain concatenation in the loop, which skips os.path.join's per-call checks
+    root_prefix = current_project_root if current_project_root.endswith(os.sep) else current_project_root + os.sep
 
-            parts = re.split(r"\s+", line, maxsplit=1)
-            file_pattern = parts[0]
-            owner_info = ""
+    # All existence checks are answered from this in-memory snapshot of the project
+    tree = build_tree(current_project_root)
 
-            if len(parts) > 1:
-                owner_info = parts[1]
+    # Read everything with a single read and split in C; lines stay bytes and only
+    # the ones holding an entry get decoded. They are dropped once parsing is done,
+    # generate_diff_patch reads the file again when a patch is requested.
+    with open(codeowners_path, "rb") as file:
+        original_lines_with_eol = file.read().splitlines(keepends=True)
 
-            effective_path_to_check = file_pattern
-            current_project_root = project_root or os.getcwd()
+    # Bind everything the loop calls per line to locals, so each use is a fast local
+    # lookup instead of a global plus attribute lookup
+    _tree_contains = tree_contains
+    _normpath = os.path.normpath
+    _add_nonexistent = nonexistent_entries_details.append
+    _sep = os.sep
+    checked_paths: dict = {} # Entry path without leading "/" -> whether it exists
 
-            if file_pattern.startswith("/"):
-                path_in_codeowners = file_pattern[1:]
-                effective_path_to_check = os.path.join(current_project_root, path_in_codeowners)
-            else:
-                effective_path_to_check = os.path.join(current_project_root, file_pattern)
-            
-            effective_path_to_check_normalized = os.path.normpath(effective_path_to_check)
+    for line_num_1_indexed, original_line_content_with_eol in enumerate(original_lines_with_eol, 1):
+        stripped_line = original_line_content_with_eol.strip()
+        if not stripped_line or stripped_line.startswith(b"#"):
+            continue
+        # bytes.strip only knows ASCII whitespace, so check again on the decoded line
+        line = stripped_line.decode("utf-8").strip()
+        if not line or line.startswith("#"):
+            continue
+
+        parts = line.split(None, 1)
+        file_pattern = parts[0]
+        owner_info = ""
+
+        if len(parts) > 1:
+            owner_info = parts[1]
+
+        path_in_codeowners = file_pattern[1:] if file_pattern.startswith("/") else file_pattern
+        # Repeated entries (same path, different owners) are checked only once
+        exists = checked_paths.get(path_in_codeowners)
+        if exists is None:
+            is_directory_pattern = file_pattern.endswith("/")
 
             exists = False
-            if "*" in file_pattern or "?" in file_pattern or "[" in file_pattern:
-                if glob.glob(effective_path_to_check_normalized):
+            if (".." not in path_in_codeowners and "//" not in path_in_codeowners
+                    and not path_in_codeowners.startswith("/") # Entries starting with "//"
+                    and "./" not in path_in_codeowners and path_in_codeowners != "."
+                    and not path_in_codeowners.endswith("/.")):
+                # Already a clean relative path (the common case), only a trailing "/" to drop
+                relative_path = path_in_codeowners[:-1] if path_in_codeowners.endswith("/") else path_in_codeowners
+                exists = _tree_contains(tree, relative_path, is_directory_pattern) if relative_path else True
+            else:
+                effective_path_to_check = root_prefix + path_in_codeowners
+                if _sep != "/":
+                    effective_path_to_check = effective_path_to_check.replace("/", _sep)
+                effective_path_to_check_normalized = _normpath(effective_path_to_check)
+                if effective_path_to_check_normalized == current_project_root:
                     exists = True
-            elif os.path.exists(effective_path_to_check_normalized):
-                exists = True
+                elif not effective_path_to_check_normalized.startswith(root_prefix): # Outside the project, not in the tree
+                    if not _GLOB_CHARS.isdisjoint(file_pattern):
+                        glob_matches = glob.glob(effective_path_to_check_normalized)
+                        if is_directory_pattern: # normpath dropped the trailing "/"
+                            exists = any(os.path.isdir(match) for match in glob_matches)
+                        else:
+                            exists = bool(glob_matches)
+                    else:
+                        exists = (os.path.isdir(effective_path_to_check_normalized) if is_directory_pattern
+                                  else os.path.lexists(effective_path_to_check_normalized))
+                else:
+                    relative_path = effective_path_to_check_normalized[len(root_prefix):]
+                    exists = _tree_contains(tree, relative_path.replace(_sep, "/"), is_directory_pattern)
+            checked_paths[path_in_codeowners] = exists
 
-            if not exists:
-                display_owner = owner_info if owner_info else "<No owner specified>"
-                nonexistent_entries_details.append((
-                    file_pattern, 
-                    display_owner, 
-                    line_num_1_indexed, 
-                    original_line_content_with_eol.rstrip('\r\n') # Store clean original line for display
-                ))
+        if not exists:
+            display_owner = owner_info if owner_info else "<No owner specified>"
+            _add_nonexistent((
+                file_pattern, 
+                display_owner, 
+                line_num_1_indexed, 
+                original_line_content_with_eol.rstrip(b'\r\n').decode("utf-8") # Store clean original line for display
+            ))
 
-    return nonexistent_entries_details, original_lines_with_eol
+    return ParseResult(nonexistent_entries_details, len(original_lines_with_eol))
 
 
-def generate_diff_patch(codeowners_filepath, nonexistent_entries, original_codeowners_lines_with_eol):
-    patch_lines = []    
+def generate_diff_patch(out_fileobj, codeowners_filepath, nonexistent_entries, original_num_lines):
+    """Writes a unified diff removing the non-existent entries to the binary out_fileobj."""
     abs_codeowners_filepath = os.path.abspath(codeowners_filepath)
     
     # Try to get path relative to git repo root
@@ -112,27 +353,24 @@ def generate_diff_patch(codeowners_filepath, nonexistent_entries, original_codeo
         except ValueError: # Happens if paths are on different drives on Windows
             relative_codeowners_filepath = os.path.basename(abs_codeowners_filepath)
 
-    patch_lines.append(f"--- a/{relative_codeowners_filepath}")
-    patch_lines.append(f"+++ b/{relative_codeowners_filepath}")
+    out_fileobj.write(f"--- a/{relative_codeowners_filepath}\n".encode("utf-8"))
+    out_fileobj.write(f"+++ b/{relative_codeowners_filepath}\n".encode("utf-8"))
 
     # nonexistent_entries has (file_pattern, owner, line_num_1_indexed, original_line_for_display)
     lines_to_delete_numbers = {entry[2] for entry in nonexistent_entries}
     
-    original_num_lines = len(original_codeowners_lines_with_eol)
     new_num_lines = original_num_lines - len(lines_to_delete_numbers)
 
-    patch_lines.append(f"@@ -1,{original_num_lines} +1,{new_num_lines} @@")
+    out_fileobj.write(f"@@ -1,{original_num_lines} +1,{new_num_lines} @@\n".encode("utf-8"))
 
-    for i, line_content_with_eol in enumerate(original_codeowners_lines_with_eol):
-        current_line_num_1_indexed = i + 1
-        # Patch format requires no trailing newline on the content of +/- lines
-        line_content_for_patch = line_content_with_eol.rstrip('\r\n')
-        if current_line_num_1_indexed in lines_to_delete_numbers:
-            patch_lines.append(f"-{line_content_for_patch}")
-        else:
-            patch_lines.append(f" {line_content_for_patch}")
-            
-    return "\n".join(patch_lines) + "\n" # Ensure final newline for patch format
+    # Split the same way as parse_codeowners so line numbers match. Patch format
+    # requires no trailing newline on the content of +/- lines, which splitlines drops.
+    with open(codeowners_filepath, "rb") as file:
+        lines_for_patch = file.read().splitlines()
+    for line_num_1_indexed, line_content_for_patch in enumerate(lines_for_patch, 1):
+        # Stream each line straight to the output instead of collecting the whole patch
+        prefix = b"-" if line_num_1_indexed in lines_to_delete_numbers else b" "
+        out_fileobj.write(prefix + line_content_for_patch + b"\n")
 
 
 def main():
@@ -156,16 +394,16 @@ def main():
     args.project_root = os.path.abspath(args.project_root)
     args.codeowners_path = os.path.abspath(args.codeowners_path)
 
-    nonexistent_entries, original_codeowners_lines = parse_codeowners(args.codeowners_path, args.project_root)
+    result = parse_codeowners(args.codeowners_path, args.project_root)
+    nonexistent_entries = result.entries
     
     console = Console()
 
     if args.generate_patch:
         if nonexistent_entries:
-            patch_content = generate_diff_patch(args.codeowners_path, nonexistent_entries, original_codeowners_lines)
             patch_filename = "stale-codeowners.patch"
-            with open(patch_filename, "w", encoding="utf-8") as f:
-                f.write(patch_content)
+            with open(patch_filename, "wb") as f: # CODEOWNERS lines are kept as raw bytes
+                generate_diff_patch(f, args.codeowners_path, nonexistent_entries, result.total_lines)
             console.print(f"[bold green]Patch file generated: {patch_filename}[/bold green]")
             sys.exit(0)
         else:
@@ -176,19 +414,39 @@ def main():
         console.print(
             f"[bold yellow]{len(nonexistent_entries)} files/patterns in CODEOWNERS do not exist (anymore).[/bold yellow]"
         )
-        table = Table(title="Non-existent files/patterns in CODEOWNERS")
-        table.add_column("Line No.", style="dim")
-        table.add_column("File/Pattern", style="cyan", no_wrap=True)
-        table.add_column("Owner", style="magenta")
-        table.add_column("Original Line Content", style="green")
-
-        for file_pattern, owner, line_num, original_line in nonexistent_entries:
-            table.add_row(str(line_num), file_pattern, owner, original_line)
-        
-        console.print(table)
+        if len(nonexistent_entries) > _MAX_TABLE_ROWS:
+            # Rich keeps every cell and measures it twice, too slow and memory hungry for huge results
+            for file_pattern, owner, line_num, original_line in nonexistent_entries:
+                console.file.write("\t".join((str(line_num), file_pattern, owner, original_line)) + "\n")
+        else:
+            table = Table(title="Non-existent files/patterns in CODEOWNERS")
+            table.add_column("Line No.", style="dim")
+            table.add_column("File/Pattern", style="cyan", no_wrap=True)
+            table.add_column("Owner", style="magenta")
+            table.add_column("Original Line Content", style="green")
+
+            for file_pattern, owner, line_num, original_line in nonexistent_entries:
+                table.add_row(str(line_num), file_pattern, owner, original_line)
+            
+            console.print(table)
     else:
         console.print("[bold green]All files/patterns listed in CODEOWNERS exist.[/bold green]")
 
 
 if __name__ == "__main__":
+    # An optional mypyc build is made from a copy of this file named main_compiled.py
+    # (see README). It is only used while that copy still matches this file, so an
+    # outdated build never runs silently.
+    compiled_source_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main_compiled.py")
+    if os.path.exists(compiled_source_path):
+        with open(__file__, "rb") as source_file, open(compiled_source_path, "rb") as compiled_source_file:
+            compiled_build_is_current = source_file.read() == compiled_source_file.read()
+        if compiled_build_is_current:
+            import importlib
+            importlib.import_module("main_compiled").main()
+            sys.exit(0)
+        Console(stderr=True).print(
+            "[bold yellow]Warning: main_compiled.py is out of date, running main.py instead. "
+            "Rebuild the compiled module as described in the README.[/bold yellow]"
+        )
     main()
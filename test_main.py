@@ -0,0 +1,157 @@
+import glob
+import os
+
+import pytest
+
+import main
+
+
+NAMES = ["a.py", "b.py", "z.py", ".hidden.py", "[x].py", "-", "|", "!x", "a-b", "^c", "]"]
+
+PATTERNS = [
+    "*", "*.py", "?.py", ".*", "[ab].py", "[!a].py", "[z-a].py", "[[]x].py", "[[]", "[-||!]",
+    "[]]", "[!]]", "[^c]c", "[a-", "a[", "*-*", "[.]hidden.py", "?hidden.py", "[\\]x].py",
+]
+
+
+def build_fixture(root, names):
+    for name in names:
+        with open(os.path.join(root, name), "w", encoding="utf-8"):
+            pass
+
+
+@pytest.mark.parametrize("pattern", PATTERNS)
+def test_tree_contains_matches_glob_glob(tmp_path, pattern):
+    build_fixture(tmp_path, NAMES)
+    tree = main.build_tree(str(tmp_path))
+
+    expected = bool(glob.glob(os.path.join(glob.escape(str(tmp_path)), pattern)))
+    assert main.tree_contains(tree, pattern) == expected
+
+
+def write_codeowners(tmp_path, content):
+    codeowners_path = tmp_path / "CODEOWNERS"
+    codeowners_path.write_text(content, encoding="utf-8")
+    return str(codeowners_path)
+
+
+def test_parse_codeowners_skips_unicode_blank_and_comment_lines(tmp_path):
+    codeowners_path = write_codeowners(tmp_path, "\u00a0\n\x1c\n\u00a0# comment @a\n/missing @b\n")
+
+    result = main.parse_codeowners(codeowners_path, str(tmp_path))
+
+    assert [entry[0] for entry in result.entries] == ["/missing"]
+    assert result.total_lines == 4
+
+
+@pytest.fixture
+def globstar_tree(tmp_path):
+    for rel_path in ["docs/intro.md", "docs/guide/setup.md", ".hidden/only.md", "README.md"]:
+        path = tmp_path / rel_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("", encoding="utf-8")
+    return main.build_tree(str(tmp_path))
+
+
+@pytest.mark.parametrize("pattern, directories_only, expected", [
+    ("docs/**/intro.md", False, True), # "**" matching zero directories
+    ("docs/**/setup.md", False, True),
+    ("**/only.md", False, False), # Hidden directories are skipped
+    (".hidden/**/only.md", False, True),
+    ("README.md/**", False, False), # A file before "**"
+    ("README.md/**/x", False, False),
+    ("docs/**", True, True), # Trailing "**/"
+    ("docs/**/*.md", True, False),
+])
+def test_tree_contains_globstar(globstar_tree, pattern, directories_only, expected):
+    assert main.tree_contains(globstar_tree, pattern, directories_only) == expected
+
+
+def test_parse_codeowners_resolves_double_slash_entries_below_root(tmp_path):
+    (tmp_path / "src" / "a").mkdir(parents=True)
+    (tmp_path / "src" / "a" / "x.py").write_text("", encoding="utf-8")
+    codeowners_path = write_codeowners(tmp_path, "//src @a\n//src/a/x.py @b\n//src/a/y.py @c\n")
+
+    result = main.parse_codeowners(codeowners_path, str(tmp_path))
+
+    assert [entry[0] for entry in result.entries] == ["//src/a/y.py"]
+
+
+def test_parse_codeowners_follows_symlinked_directories(tmp_path):
+    (tmp_path / "src" / "a").mkdir(parents=True)
+    (tmp_path / "src" / "a" / "x.py").write_text("", encoding="utf-8")
+    os.symlink("src", tmp_path / "linkdir")
+    os.symlink(".", tmp_path / "src" / "loop") # A cycle must not hang the walk
+    codeowners_path = write_codeowners(
+        tmp_path, "/linkdir/ @a\n/linkdir/a/x.py @b\n/src/loop/loop/a/x.py @c\n/linkdir/a/y.py @d\n"
+    )
+
+    result = main.parse_codeowners(codeowners_path, str(tmp_path))
+
+    assert [entry[0] for entry in result.entries] == ["/linkdir/a/y.py"]
+
+
+def test_parse_codeowners_directory_globs_outside_root_need_a_directory(tmp_path):
+    project_root = tmp_path / "project"
+    project_root.mkdir()
+    (tmp_path / "other").mkdir()
+    (tmp_path / "other" / "file.py").write_text("", encoding="utf-8")
+    (tmp_path / "dirs" / "sub").mkdir(parents=True)
+    codeowners_path = write_codeowners(project_root, "../other/*/ @a\n../dirs/*/ @b\n../other/*.py @c\n")
+
+    result = main.parse_codeowners(codeowners_path, str(project_root))
+
+    assert [entry[0] for entry in result.entries] == ["../other/*/"]
+
+
+def test_build_tree_tolerates_undecodable_gitignore(tmp_path):
+    (tmp_path / ".gitignore").write_bytes(b"\xff\xfe\nbuild/\n")
+    (tmp_path / "build").mkdir()
+    (tmp_path / "src").mkdir()
+
+    tree = main.build_tree(str(tmp_path))
+
+    assert isinstance(tree["build"], main.UnwalkedDirectory)
+    assert tree["src"] == {}
+
+
+def test_parse_codeowners_keeps_siblings_of_a_looping_symlink(tmp_path):
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "a.py").write_text("", encoding="utf-8")
+    (tmp_path / "src" / "b.py").write_text("", encoding="utf-8")
+    os.symlink("selfloop", tmp_path / "src" / "selfloop")
+    codeowners_path = write_codeowners(tmp_path, "/src/a.py @a\n/src/b.py @b\n/src/c.py @c\n")
+
+    result = main.parse_codeowners(codeowners_path, str(tmp_path))
+
+    assert [entry[0] for entry in result.entries] == ["/src/c.py"]
+
+
+def test_build_tree_does_not_follow_symlinks_out_of_the_project(tmp_path):
+    project_root = tmp_path / "project"
+    project_root.mkdir()
+    (tmp_path / "outside" / "lib").mkdir(parents=True)
+    (tmp_path / "outside" / "lib" / "x.c").write_text("", encoding="utf-8")
+    os.symlink(tmp_path / "outside", project_root / "ext")
+    codeowners_path = write_codeowners(
+        project_root, "/ext/ @a\n/ext/lib/x.c @b\n/ext/*/x.c @c\n/ext/**/x.c @d\n/ext/lib/y.c @e\n/ext/lib/x.c/ @f\n"
+    )
+
+    tree = main.build_tree(str(project_root))
+    result = main.parse_codeowners(codeowners_path, str(project_root))
+
+    assert isinstance(tree["ext"], main.UnwalkedDirectory)
+    assert [entry[0] for entry in result.entries] == ["/ext/lib/y.c", "/ext/lib/x.c/"]
+
+
+def test_parse_codeowners_checks_gitignored_directories_on_disk(tmp_path):
+    (tmp_path / ".gitignore").write_text("vendor/\n", encoding="utf-8")
+    (tmp_path / "vendor" / "lib").mkdir(parents=True)
+    (tmp_path / "vendor" / "lib" / "x.c").write_text("", encoding="utf-8")
+    codeowners_path = write_codeowners(
+        tmp_path, "/vendor/lib/x.c @a\n/vendor/**/x.c @b\n/vendor/ @c\n/vendor/lib/y.c @d\n"
+    )
+
+    result = main.parse_codeowners(codeowners_path, str(tmp_path))
+
+    assert [entry[0] for entry in result.entries] == ["/vendor/lib/y.c"]